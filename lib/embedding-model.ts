@@ -3,7 +3,7 @@
  * Uses local Python inference for development, falls back to Hugging Face API for production (Vercel).
  */
 
-import { spawn } from 'child_process';
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
 import path from 'path';
 import fs from 'fs';
 
@@ -167,59 +167,157 @@ async function generateEmbeddingWithHuggingFace(text: string): Promise<number[]>
 }
 
 /**
- * Generate embedding using local Python model (for development)
+ * Long-lived Python inference daemon (for development).
+ * Loading the SentenceTransformer takes seconds while encoding takes
+ * milliseconds, so we keep one `inference.py --serve` process alive and
+ * exchange JSON lines over stdin/stdout instead of spawning per request.
  */
-async function generateEmbeddingLocal(text: string): Promise<number[]> {
-  return new Promise((resolve, reject) => {
-    const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
-    const python = spawn(pythonCommand, [INFERENCE_SCRIPT, text], {
-      env: {
-        ...process.env,
-        RECIPE_MODEL_DIR: resolveModelDir() ?? "",
-      },
-    });
+interface InferenceResponse {
+  id: number;
+  embedding?: number[];
+  embeddings?: number[][];
+  error?: string;
+}
 
-    let stdout = '';
-    let stderr = '';
-    const timeoutId = setTimeout(() => {
-      python.kill();
-      reject(new Error("Python inference timed out"));
-    }, PYTHON_TIMEOUT_MS);
+interface PendingInference {
+  resolve: (message: InferenceResponse) => void;
+  reject: (error: Error) => void;
+  timeoutId: NodeJS.Timeout;
+}
 
-    python.stdout.on('data', (data) => {
-      stdout += data.toString();
-    });
+let inferenceDaemon: ChildProcessWithoutNullStreams | null = null;
+let daemonStdoutBuffer = '';
+let nextInferenceId = 1;
+const pendingInferences = new Map<number, PendingInference>();
 
-    python.stderr.on('data', (data) => {
-      stderr += data.toString();
-    });
+function rejectAllPending(error: Error) {
+  for (const pending of pendingInferences.values()) {
+    clearTimeout(pending.timeoutId);
+    pending.reject(error);
+  }
+  pendingInferences.clear();
+}
 
-    python.on('close', (code) => {
-      clearTimeout(timeoutId);
-      if (code !== 0) {
-        reject(new Error(`Python inference failed: ${stderr || 'Unknown error'}`));
-        return;
-      }
+function getInferenceDaemon(): ChildProcessWithoutNullStreams {
+  if (inferenceDaemon && inferenceDaemon.exitCode === null) {
+    return inferenceDaemon;
+  }
+
+  const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
+  const python = spawn(pythonCommand, [INFERENCE_SCRIPT, '--serve'], {
+    env: {
+      ...process.env,
+      RECIPE_MODEL_DIR: resolveModelDir() ?? "",
+    },
+  });
 
+  daemonStdoutBuffer = '';
+  python.stdout.on('data', (data) => {
+    daemonStdoutBuffer += data.toString();
+    let newlineIndex: number;
+    while ((newlineIndex = daemonStdoutBuffer.indexOf('\n')) !== -1) {
+      const line = daemonStdoutBuffer.slice(0, newlineIndex).trim();
+      daemonStdoutBuffer = daemonStdoutBuffer.slice(newlineIndex + 1);
+      if (!line) continue;
       try {
-        const result = JSON.parse(stdout.trim());
-        if (result.error) {
-          reject(new Error(result.error));
-          return;
+        const message = JSON.parse(line);
+        const pending = pendingInferences.get(message.id);
+        if (!pending) continue;
+        pendingInferences.delete(message.id);
+        clearTimeout(pending.timeoutId);
+        if (message.error) {
+          pending.reject(new Error(message.error));
+        } else {
+          pending.resolve(message);
         }
-        resolve(result.embedding);
-      } catch (error: any) {
-        reject(new Error(`Failed to parse embedding result: ${error.message}`));
+      } catch {
+        // Ignore non-JSON output (e.g. library progress noise)
       }
-    });
+    }
+  });
 
-    python.on('error', (error) => {
-      clearTimeout(timeoutId);
-      reject(new Error(`Failed to start Python process: ${error.message}`));
+  python.stderr.on('data', (data) => {
+    if (process.env.NODE_ENV === "development") {
+      console.warn('[embedding] inference daemon:', data.toString().trim());
+    }
+  });
+
+  python.on('exit', () => {
+    if (inferenceDaemon === python) inferenceDaemon = null;
+    rejectAllPending(new Error('Python inference daemon exited'));
+  });
+
+  python.on('error', (error) => {
+    if (inferenceDaemon === python) inferenceDaemon = null;
+    rejectAllPending(new Error(`Failed to start Python process: ${error.message}`));
+  });
+
+  inferenceDaemon = python;
+  return python;
+}
+
+/**
+ * Stop the inference daemon (e.g. at the end of a loading script so the
+ * Node process can exit).
+ */
+export function shutdownEmbeddingDaemon() {
+  if (inferenceDaemon) {
+    inferenceDaemon.kill();
+    inferenceDaemon = null;
+  }
+  rejectAllPending(new Error('Embedding daemon shut down'));
+}
+
+function requestInference(
+  payload: { text: string } | { texts: string[] },
+  timeoutMs: number
+): Promise<InferenceResponse> {
+  return new Promise((resolve, reject) => {
+    const python = getInferenceDaemon();
+    const id = nextInferenceId++;
+
+    const timeoutId = setTimeout(() => {
+      pendingInferences.delete(id);
+      reject(new Error("Python inference timed out"));
+    }, timeoutMs);
+
+    pendingInferences.set(id, { resolve, reject, timeoutId });
+
+    python.stdin.write(JSON.stringify({ id, ...payload }) + '\n', (error) => {
+      if (error && pendingInferences.has(id)) {
+        pendingInferences.delete(id);
+        clearTimeout(timeoutId);
+        reject(new Error(`Failed to reach inference daemon: ${error.message}`));
+      }
     });
   });
 }
 
+/**
+ * Generate embedding using local Python model (for development)
+ */
+async function generateEmbeddingLocal(text: string): Promise<number[]> {
+  const message = await requestInference({ text }, PYTHON_TIMEOUT_MS);
+  if (!message.embedding) {
+    throw new Error('Inference daemon returned no embedding');
+  }
+  return message.embedding;
+}
+
+/**
+ * Generate embeddings for many texts in one daemon round-trip. The Python
+ * side encodes the whole batch at once, which is several times faster per
+ * text than one request per text.
+ */
+async function generateEmbeddingsLocal(texts: string[]): Promise<number[][]> {
+  const timeoutMs = PYTHON_TIMEOUT_MS + texts.length * 50;
+  const message = await requestInference({ texts }, timeoutMs);
+  if (!message.embeddings || message.embeddings.length !== texts.length) {
+    throw new Error('Inference daemon returned a mismatched batch');
+  }
+  return message.embeddings;
+}
+
 function normalizeEmbeddingText(text: string): string {
   return text.toLowerCase().trim().replace(/\s+/g, " ").slice(0, 800);
 }
@@ -288,14 +386,47 @@ export async function generateEmbedding(text: string): Promise<number[]> {
 
 /**
  * Generate embeddings for multiple texts (batch processing).
+ * Uses one batched daemon call for cache misses when the local model is
+ * available; otherwise falls back to per-text requests.
  * @param texts - Array of texts to embed
  * @returns Array of embedding vectors
  */
 export async function generateEmbeddings(texts: string[]): Promise<number[][]> {
-  const embeddings = await Promise.all(
-    texts.map(text => generateEmbedding(text))
-  );
-  return embeddings;
+  if (!isModelAvailable()) {
+    return Promise.all(texts.map(text => generateEmbedding(text)));
+  }
+
+  const results: number[][] = new Array(texts.length);
+  const missIndexes: number[] = [];
+  for (let i = 0; i < texts.length; i++) {
+    const cached = getCachedEmbedding(normalizeEmbeddingText(texts[i]));
+    if (cached) {
+      results[i] = cached;
+    } else {
+      missIndexes.push(i);
+    }
+  }
+
+  if (missIndexes.length > 0) {
+    try {
+      const embeddings = await generateEmbeddingsLocal(missIndexes.map(i => texts[i]));
+      missIndexes.forEach((textIndex, batchIndex) => {
+        results[textIndex] = embeddings[batchIndex];
+        setCachedEmbedding(normalizeEmbeddingText(texts[textIndex]), embeddings[batchIndex]);
+      });
+    } catch (error: any) {
+      if (process.env.NODE_ENV === "development") {
+        console.warn("[embedding] Batch inference failed, using per-text path:", error.message);
+      }
+      await Promise.all(
+        missIndexes.map(async i => {
+          results[i] = await generateEmbedding(texts[i]);
+        })
+      );
+    }
+  }
+
+  return results;
 }
 
 /**
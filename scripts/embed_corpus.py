@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Bulk-embed the recipe corpus with the trained model.
+
+Spreads encoding across all GPUs, or CPU worker processes, via
+SentenceTransformer's multi-process pool. Useful after retraining, when
+the whole recipe library needs re-embedding.
+
+    python scripts/embed_corpus.py [path/to/recipes.csv] [output.npy]
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from train_model import MODEL_DIR, build_recipe_frame, find_dataset, load_recipes
+
+DEFAULT_OUTPUT = Path(__file__).parent.parent / "RecipeModel" / "corpus_embeddings.npy"
+
+
+def main():
+    csv_path = find_dataset()
+    output_path = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_OUTPUT
+
+    if not MODEL_DIR.exists():
+        print(f"Trained model not found at {MODEL_DIR}. Run scripts/train_model.py first.")
+        sys.exit(1)
+
+    df = load_recipes(csv_path)
+    texts = build_recipe_frame(df)["text"].tolist()
+    model = SentenceTransformer(str(MODEL_DIR))
+
+    if torch.cuda.is_available():
+        devices = [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+    else:
+        devices = ["cpu"] * max(1, min(8, os.cpu_count() or 1))
+
+    print(f"Encoding {len(texts)} recipes across {len(devices)} worker(s): {devices}")
+    pool = model.start_multi_process_pool(target_devices=devices)
+    try:
+        embeddings = model.encode_multi_process(
+            texts, pool, batch_size=64, normalize_embeddings=True
+        )
+    finally:
+        model.stop_multi_process_pool(pool)
+
+    np.save(output_path, embeddings.astype(np.float32))
+    print(f"Saved {embeddings.shape[0]}x{embeddings.shape[1]} embeddings to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,31 @@ import sys
 import json
 import os
 from pathlib import Path
+
+# orjson is optional: it serializes numpy arrays directly at C speed,
+# but existing venvs only have sentence-transformers, so fall back to
+# stdlib json rather than failing at startup.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Thread limits must be exported before numpy/torch load MKL/OpenMP, and
+# a Node-spawned subprocess otherwise often ends up with a bad default.
+_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", max(1, (os.cpu_count() or 2) - 1)))
+os.environ.setdefault("OMP_NUM_THREADS", str(_NUM_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(_NUM_THREADS))
+
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
+torch.set_num_threads(_NUM_THREADS)
+try:
+    torch.set_num_interop_threads(2)
+except RuntimeError:
+    pass  # interop pool already started (e.g. re-import)
+
 def resolve_model_dir() -> Path:
     """
     Resolve model path from env override first, then known locations.
@@ -32,45 +55,202 @@ def resolve_model_dir() -> Path:
 # Get model directory
 MODEL_DIR = resolve_model_dir()
 
+def resolve_onnx_dir() -> Path:
+    """Resolve the ONNX export (see scripts/export_onnx.py) if present."""
+    env_path = os.getenv("RECIPE_ONNX_DIR")
+    if env_path:
+        return Path(env_path)
+    return MODEL_DIR.parent / "recipe-embedder-onnx"
+
+class OnnxEncoder:
+    """
+    ONNX Runtime encoder with the same encode() surface as
+    SentenceTransformer. Runs the int8-quantized export when available,
+    with mean pooling and L2 normalization done in numpy.
+    """
+
+    def __init__(self, onnx_dir: Path):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = onnx_dir / "model_int8.onnx"
+        if not model_path.exists():
+            model_path = onnx_dir / "model.onnx"
+        self.session = ort.InferenceSession(
+            str(model_path), providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(str(onnx_dir))
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=64, normalize_embeddings=True, show_progress_bar=False):
+        # Sort by length so each batch pads to similar-sized members,
+        # mirroring SentenceTransformer.encode; the inverse permutation
+        # restores input order at the end.
+        order = np.argsort([len(t) for t in texts])
+        outputs = []
+        for start in range(0, len(order), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            encoded = self.tokenizer(
+                batch, padding=True, truncation=True, max_length=256, return_tensors="np"
+            )
+            feeds = {k: v for k, v in encoded.items() if k in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = encoded["attention_mask"][:, :, None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            outputs.append(pooled)
+        if not outputs:
+            return np.empty((0, 0))
+        embeddings = np.concatenate(outputs)
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        embeddings = embeddings[inverse]
+        if normalize_embeddings and embeddings.size:
+            embeddings = embeddings / np.maximum(
+                np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12
+            )
+        return embeddings
+
 # Global model cache
 _model = None
 
 def load_model():
-    """Load the model (cached for performance)."""
+    """Load the model (cached for performance), preferring the ONNX export."""
     global _model
     if _model is None:
         if not MODEL_DIR.exists():
             print(json.dumps({"error": f"Google Colab trained model not found at {MODEL_DIR}. Please ensure the model is placed in models/recipe-embedder/ or RecipeModel/models/recipe-embedder/"}))
             sys.exit(1)
-        
+
+        onnx_dir = resolve_onnx_dir()
+        if onnx_dir.exists():
+            try:
+                _model = OnnxEncoder(onnx_dir)
+                return _model
+            except Exception as e:
+                print(f"ONNX model unavailable ({e}), using PyTorch model", file=sys.stderr)
+
         try:
             _model = SentenceTransformer(str(MODEL_DIR))
         except Exception as e:
             print(json.dumps({"error": f"Failed to load model: {str(e)}"}))
             sys.exit(1)
-    
+
     return _model
 
+def generate_embeddings(texts):
+    """
+    Generate embeddings for a batch of texts. One encode call amortizes
+    tokenization and the transformer forward pass across the whole batch,
+    which is several times faster per text than encoding one at a time.
+    """
+    model = load_model()
+    # Both the SentenceTransformer and ONNX encoders sort multi-text
+    # input by length, so batches are padded to similar-length members
+    # rather than the global max.
+    embeddings = model.encode(
+        texts,
+        batch_size=64,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    # Stays a numpy array until serialization; orjson writes it directly
+    # without boxing every float into a Python object first. FP16 after
+    # L2 normalization is indistinguishable for cosine retrieval and
+    # halves the transport and storage size of every vector.
+    return embeddings.astype(np.float16)
+
 def generate_embedding(text: str):
     """Generate embedding for a single text."""
-    model = load_model()
-    embedding = model.encode(text, normalize_embeddings=True)
-    return embedding.tolist()
+    return generate_embeddings([text])[0]
+
+def _to_jsonable(response: dict) -> dict:
+    """Stdlib-json fallback: convert numpy arrays to plain lists."""
+    return {
+        key: value.tolist() if isinstance(value, np.ndarray) else value
+        for key, value in response.items()
+    }
+
+def write_response(response: dict):
+    """Serialize one response (numpy arrays included) to stdout."""
+    if orjson is not None:
+        try:
+            payload = orjson.dumps(response, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # orjson < 3.9.3 can't serialize float16 arrays.
+            payload = json.dumps(_to_jsonable(response)).encode()
+    else:
+        payload = json.dumps(_to_jsonable(response)).encode()
+    sys.stdout.buffer.write(payload + b"\n")
+    sys.stdout.buffer.flush()
+
+def serve():
+    """
+    Daemon mode: read JSON requests line-by-line from stdin and write one
+    JSON response per line to stdout. Loading the model takes seconds while
+    encoding takes milliseconds, so Node keeps this process alive instead
+    of paying the model load on every request.
+    """
+    load_model()
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        req_id = None
+        try:
+            request = json.loads(line)
+            req_id = request.get("id")
+            if "texts" in request:
+                embeddings = generate_embeddings(request["texts"])
+                response = {
+                    "id": req_id,
+                    "embeddings": embeddings,
+                    "dimension": len(embeddings[0]) if len(embeddings) else 0,
+                }
+            else:
+                embedding = generate_embedding(request["text"])
+                response = {"id": req_id, "embedding": embedding, "dimension": len(embedding)}
+        except Exception as e:
+            response = {"id": req_id, "error": str(e)}
+        try:
+            write_response(response)
+        except Exception as e:
+            # One unserializable response must not kill the daemon.
+            write_response({"id": req_id, "error": f"Failed to serialize response: {e}"})
 
 def main():
+    if "--serve" in sys.argv[1:]:
+        serve()
+        return
+
     if len(sys.argv) < 2:
         print(json.dumps({"error": "No text provided"}))
         sys.exit(1)
-    
-    text = sys.argv[1]
-    
+
+    # A JSON array argument means batch mode; anything else is a single text.
+    raw = sys.argv[1]
+    texts = None
+    if raw.lstrip().startswith("["):
+        try:
+            parsed = json.loads(raw)
+            if isinstance(parsed, list):
+                texts = [str(t) for t in parsed]
+        except json.JSONDecodeError:
+            pass
+
     try:
-        embedding = generate_embedding(text)
-        result = {
-            "embedding": embedding,
-            "dimension": len(embedding)
-        }
-        print(json.dumps(result))
+        if texts is not None:
+            embeddings = generate_embeddings(texts)
+            result = {
+                "embeddings": embeddings,
+                "dimension": len(embeddings[0]) if len(embeddings) else 0
+            }
+        else:
+            embedding = generate_embedding(raw)
+            result = {
+                "embedding": embedding,
+                "dimension": len(embedding)
+            }
+        write_response(result)
     except Exception as e:
         print(json.dumps({"error": str(e)}))
         sys.exit(1)
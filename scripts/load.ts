@@ -3,7 +3,7 @@ import fs from "fs";
 import path from "path";
 import Papa from "papaparse";
 import dotenv from "dotenv";
-import { generateEmbedding } from "../lib/embedding-model.js";
+import { generateEmbedding, shutdownEmbeddingDaemon } from "../lib/embedding-model.js";
 import { createReadStream } from "fs";
 
 dotenv.config();
@@ -287,4 +287,7 @@ Instructions: ${recipe.instructions}
   });
 }
 
-main().finally(() => prisma.$disconnect());
+main().finally(() => {
+  shutdownEmbeddingDaemon();
+  return prisma.$disconnect();
+});
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Training script for the custom recipe embedding model.
+
+Fine-tunes all-MiniLM-L6-v2 on recipe pairs (same-cuisine positives,
+cross-cuisine negatives, shared-ingredient positives) and saves the
+result where scripts/inference.py expects it.
+
+Originally run on Google Colab; checked in so the pipeline can be
+re-run locally:
+    python scripts/train_model.py [path/to/recipes.csv]
+"""
+
+import ast
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+# Thread limits must be exported before numpy/torch load MKL/OpenMP.
+_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", max(1, (os.cpu_count() or 2) - 1)))
+os.environ.setdefault("OMP_NUM_THREADS", str(_NUM_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(_NUM_THREADS))
+
+import numpy as np
+import orjson
+import pandas as pd
+import torch
+from datasets import Dataset
+from sentence_transformers import (
+    InputExample,
+    SentenceTransformer,
+    SentenceTransformerTrainer,
+    SentenceTransformerTrainingArguments,
+    losses,
+)
+from sklearn.feature_extraction.text import CountVectorizer
+
+torch.set_num_threads(_NUM_THREADS)
+try:
+    torch.set_num_interop_threads(2)
+except RuntimeError:
+    pass  # interop pool already started (e.g. re-import)
+
+BASE_MODEL = "all-MiniLM-L6-v2"
+MODEL_DIR = Path(__file__).parent.parent / "RecipeModel" / "models" / "recipe-embedder"
+
+MAX_RECIPES_FOR_TRAINING = 50000
+MAX_TRAINING_EXAMPLES = 200000
+MAX_SAMPLES_PER_CUISINE = 200
+BATCH_SIZE = 256
+EPOCHS = 1
+CHUNK_SIZE = 10000
+
+USE_GPU = torch.cuda.is_available()
+
+# Word tokens for ingredient similarity: letters only, two or more chars,
+# so quantities ("1 2 cup") and punctuation never count as shared
+# ingredients. Compiled once; the vectorizer reuses it per document.
+_INGREDIENT_TOKEN = re.compile(r"[a-z]{2,}")
+
+# Different public recipe dumps name the same columns differently.
+COLUMN_ALIASES = {
+    "title": ["title", "recipe_name", "name"],
+    "ingredients": ["ingredients", "ingredients_list", "NER"],
+    "directions": ["directions", "instructions", "steps"],
+    "cuisine": ["cuisine_path", "cuisine", "category"],
+}
+
+DATASET_CANDIDATES = [
+    Path(__file__).parent.parent / "dataset" / "recipes.csv",
+    Path(__file__).parent.parent / "RecipeModel" / "recipes.csv",
+]
+
+
+def find_dataset() -> Path:
+    """Resolve the recipe CSV from argv or known locations."""
+    if len(sys.argv) > 1:
+        p = Path(sys.argv[1])
+        if p.exists():
+            return p
+        print(f"Dataset not found at {p}")
+        sys.exit(1)
+
+    for candidate in DATASET_CANDIDATES:
+        if candidate.exists():
+            return candidate
+
+    print("No recipe dataset found. Pass the CSV path as an argument:")
+    print("  python scripts/train_model.py path/to/recipes.csv")
+    sys.exit(1)
+
+
+def _load_recipes_polars(csv_path: Path):
+    """
+    Polars fast path: multi-threaded CSV scan with streaming collect and
+    the column pruning pushed into the reader. Returns None when polars
+    is not installed so the pandas paths take over.
+    """
+    try:
+        import polars as pl
+    except ImportError:
+        return None
+
+    try:
+        wanted = {alt for alternatives in COLUMN_ALIASES.values() for alt in alternatives}
+        lf = pl.scan_csv(csv_path, low_memory=True, ignore_errors=True, infer_schema_length=0)
+        columns = [c for c in lf.collect_schema().names() if c in wanted]
+        if columns:
+            lf = lf.select(columns)
+        try:
+            df = lf.collect(engine="streaming")
+        except TypeError:
+            # polars < 1.25 predates engine=; streaming= is deprecated
+            # on newer releases and slated for removal.
+            df = lf.collect(streaming=True)
+        if len(df) > MAX_RECIPES_FOR_TRAINING:
+            df = df.sample(n=MAX_RECIPES_FOR_TRAINING, seed=42)
+        return df.to_pandas()
+    except Exception as e:
+        # The fast path is opportunistic; any polars failure falls back
+        # to the pandas readers instead of taking down load_recipes.
+        print(f"polars fast path failed ({e}), falling back to pandas")
+        return None
+
+
+def _last_write_selector(slot_ids: np.ndarray) -> np.ndarray:
+    """
+    Positions of the last occurrence of each unique slot id.
+
+    Sequential Algorithm R lets the latest replacement of a slot win,
+    but DataFrame .iloc assignment with duplicate positions keeps the
+    first write -- so colliding replacements must be deduplicated to
+    their last occurrence before assigning, or the sample skews toward
+    earlier rows.
+    """
+    _, rev_first = np.unique(slot_ids[::-1], return_index=True)
+    return len(slot_ids) - 1 - rev_first
+
+
+def _reservoir_sample_arrow(csv_path: Path, usecols, k: int):
+    """
+    Stream the CSV through pyarrow's multi-threaded reader (64 MB
+    memory-mapped blocks) and reservoir-sample k rows, converting only
+    the accepted rows to pandas. Returns None when pyarrow is missing.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        return None
+
+    rng = np.random.default_rng(42)
+    read_opts = pacsv.ReadOptions(block_size=64 << 20, use_threads=True)
+    parse_opts = pacsv.ParseOptions(invalid_row_handler=lambda _row: "skip")
+    convert_opts = pacsv.ConvertOptions(
+        include_columns=usecols or None,
+        column_types={c: pa.string() for c in usecols},
+    )
+
+    reservoir = None
+    seen = 0
+    with pacsv.open_csv(
+        csv_path,
+        read_options=read_opts,
+        parse_options=parse_opts,
+        convert_options=convert_opts,
+    ) as reader:
+        for batch in reader:
+            if reservoir is None or len(reservoir) < k:
+                have = len(reservoir) if reservoir is not None else 0
+                take_n = min(batch.num_rows, k - have)
+                head = batch.slice(0, take_n).to_pandas()
+                reservoir = (
+                    head if reservoir is None else pd.concat([reservoir, head], ignore_index=True)
+                )
+                seen += take_n
+                batch = batch.slice(take_n)
+                if batch.num_rows == 0:
+                    continue
+            # Row t of the stream replaces a random slot with odds k/t.
+            slots = rng.integers(0, seen + np.arange(1, batch.num_rows + 1))
+            accept = np.flatnonzero(slots < k)
+            if len(accept):
+                sel = _last_write_selector(slots[accept])
+                rows = batch.take(pa.array(accept[sel])).to_pandas()
+                reservoir.iloc[slots[accept[sel]]] = rows.to_numpy()
+            seen += batch.num_rows
+
+    if reservoir is None:
+        return pd.DataFrame(columns=usecols)
+    return reservoir.reset_index(drop=True)
+
+
+def load_recipes(csv_path: Path) -> pd.DataFrame:
+    """Load the recipe CSV, sampling down to MAX_RECIPES_FOR_TRAINING."""
+    df = _load_recipes_polars(csv_path)
+    if df is not None:
+        df = df.reset_index(drop=True)
+        print(f"Loaded {len(df)} recipes")
+        return df
+
+    file_size_mb = csv_path.stat().st_size / (1024 * 1024)
+
+    # Only parse the columns the pipeline actually reads, as plain
+    # strings -- dtype inference over the unused columns is wasted work.
+    wanted = {alt for alternatives in COLUMN_ALIASES.values() for alt in alternatives}
+    header = pd.read_csv(csv_path, nrows=0)
+    usecols = [c for c in header.columns if c in wanted]
+    read_kwargs = {"usecols": usecols or None, "dtype": str, "on_bad_lines": "skip"}
+
+    if file_size_mb > 100:
+        # Large file: single-pass reservoir sample over the chunks.
+        # Never holds more than MAX_RECIPES_FOR_TRAINING rows (plus one
+        # chunk) in memory, and every row of the file has equal odds of
+        # being kept -- the old approach only ever saw the first ~60k.
+        print(f"Large dataset ({file_size_mb:.0f} MB), reservoir-sampling chunks...")
+        k = MAX_RECIPES_FOR_TRAINING
+        arrow_df = _reservoir_sample_arrow(csv_path, usecols, k)
+        if arrow_df is not None:
+            print(f"Loaded {len(arrow_df)} recipes")
+            return arrow_df
+        rng = np.random.default_rng(42)
+        reservoir = None
+        seen = 0
+        for chunk in pd.read_csv(csv_path, chunksize=CHUNK_SIZE, engine="c", **read_kwargs):
+            if reservoir is None or len(reservoir) < k:
+                take = chunk.iloc[: k - (len(reservoir) if reservoir is not None else 0)]
+                reservoir = (
+                    take.copy()
+                    if reservoir is None
+                    else pd.concat([reservoir, take], ignore_index=True)
+                )
+                seen += len(take)
+                chunk = chunk.iloc[len(take):]
+                if chunk.empty:
+                    continue
+            # Row t of the stream replaces a random slot with odds k/t.
+            slots = rng.integers(0, seen + np.arange(1, len(chunk) + 1))
+            accept = np.flatnonzero(slots < k)
+            if len(accept):
+                sel = _last_write_selector(slots[accept])
+                reservoir.iloc[slots[accept[sel]]] = chunk.iloc[accept[sel]].to_numpy()
+            seen += len(chunk)
+        df = reservoir if reservoir is not None else pd.DataFrame(columns=usecols)
+        df = df.reset_index(drop=True)
+    else:
+        try:
+            # pandas >= 2.0: multi-threaded pyarrow CSV reader.
+            df = pd.read_csv(csv_path, engine="pyarrow", **read_kwargs)
+        except (ImportError, ValueError):
+            df = pd.read_csv(csv_path, **read_kwargs)
+
+    if len(df) > MAX_RECIPES_FOR_TRAINING:
+        df = df.sample(n=MAX_RECIPES_FOR_TRAINING, random_state=42).reset_index(drop=True)
+
+    print(f"Loaded {len(df)} recipes")
+    return df
+
+
+def _resolve_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename dataset-specific column names to canonical ones."""
+    renames = {}
+    for canonical, alternatives in COLUMN_ALIASES.items():
+        for alt in alternatives:
+            if alt in df.columns:
+                renames[alt] = canonical
+                break
+    df = df.rename(columns=renames)
+    for canonical in COLUMN_ALIASES:
+        if canonical not in df.columns:
+            df[canonical] = ""
+    return df
+
+
+def _join_list_cell(value: str) -> str:
+    """Turn a stringified list cell ('["a", "b"]') into 'a, b'."""
+    if not value.startswith(("[", "(")):
+        return value
+    # Most cells are plain JSON arrays; orjson parses those in C.
+    # ast.literal_eval only runs for Python-literal cells ('["it\\'s"]').
+    try:
+        parsed = orjson.loads(value)
+    except orjson.JSONDecodeError:
+        try:
+            parsed = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    if isinstance(parsed, (list, tuple)):
+        return ", ".join(str(item) for item in parsed)
+    return value
+
+
+def build_recipe_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize the raw CSV frame to canonical columns and add the combined
+    'text' column used for embedding. Built with whole-column string ops
+    instead of iterating rows -- the per-row version took minutes at 50k
+    recipes.
+    """
+    df = _resolve_columns(df)
+    frame = pd.DataFrame(
+        {
+            "title": df["title"].fillna("").astype(str),
+            "ingredients": df["ingredients"].fillna("").astype(str).map(_join_list_cell),
+            "directions": df["directions"].fillna("").astype(str).map(_join_list_cell),
+            "cuisine": df["cuisine"]
+            .fillna("")
+            .astype(str)
+            .str.strip("/")
+            .str.split("/")
+            .str[-1]
+            .fillna(""),
+        }
+    )
+    frame["text"] = (
+        frame["title"]
+        + "\nIngredients: "
+        + frame["ingredients"]
+        + "\nInstructions: "
+        + frame["directions"].str.slice(0, 500)
+    )
+    return frame
+
+
+def prepare_training_data(df: pd.DataFrame):
+    """Build recipe texts, metadata, and InputExample training pairs."""
+    # One generator for the whole function: re-seeding the global RNG per
+    # cuisine made every group draw from the same state (and leaked the
+    # seed into everything else in the process).
+    rng = np.random.default_rng(42)
+    frame = build_recipe_frame(df)
+    cuisines = frame["cuisine"]
+    recipe_texts = frame["text"].tolist()
+
+    # Metadata as parallel arrays (struct-of-arrays) instead of a list of
+    # dicts -- 50k small dicts cost ~15 MB and a hash lookup per access.
+    cuisines_arr = cuisines.to_numpy(dtype=object)
+    ingredients_lower = frame["ingredients"].str.lower().to_numpy(dtype=object)
+    titles_lower = frame["title"].str.lower().to_numpy(dtype=object)
+
+    print(f"Prepared {len(recipe_texts)} recipe texts")
+
+    # Clean cuisines once up front -- strip whitespace, drop empties --
+    # then group; the pair loops below never re-check keys. The group
+    # labels are the original row positions (RangeIndex after load).
+    cuisine_series = cuisines.str.strip()
+    cuisine_series = cuisine_series[cuisine_series.astype(bool)]
+    cuisine_groups = {
+        name: labels.to_numpy()
+        for name, labels in cuisine_series.groupby(cuisine_series).groups.items()
+    }
+
+    training_examples = []
+
+    # Positive pairs: recipes from the same cuisine.
+    for cuisine, indices in cuisine_groups.items():
+        if len(indices) < 2:
+            continue
+        sampled = rng.choice(
+            indices, size=min(len(indices), MAX_SAMPLES_PER_CUISINE), replace=False
+        )
+        # Pair each sampled recipe with its next two neighbours; numpy
+        # generates the index arrays, one comprehension builds the pairs.
+        n = len(sampled)
+        firsts = np.concatenate([np.arange(n - 1), np.arange(max(n - 2, 0))])
+        seconds = np.concatenate([np.arange(1, n), np.arange(2, n)])
+        training_examples.extend(
+            InputExample(
+                texts=[recipe_texts[sampled[a]], recipe_texts[sampled[b]]],
+                label=1.0,
+            )
+            for a, b in zip(firsts, seconds)
+        )
+        if len(training_examples) >= MAX_TRAINING_EXAMPLES:
+            break
+
+    print(f"Created {len(training_examples)} same-cuisine pairs")
+
+    # Negative pairs: recipes from different cuisines.
+    cuisine_names = [c for c in cuisine_groups if len(cuisine_groups[c]) >= 2]
+    if len(cuisine_names) >= 2:
+        negatives_needed = min(len(training_examples) // 2, MAX_TRAINING_EXAMPLES // 4)
+        for _ in range(negatives_needed):
+            c_a, c_b = rng.choice(len(cuisine_names), size=2, replace=False)
+            idx_a = rng.choice(cuisine_groups[cuisine_names[c_a]])
+            idx_b = rng.choice(cuisine_groups[cuisine_names[c_b]])
+            training_examples.append(
+                InputExample(texts=[recipe_texts[idx_a], recipe_texts[idx_b]], label=0.0)
+            )
+
+    print(f"{len(training_examples)} pairs after negatives")
+
+    # Extra positive pairs: recipes that share many ingredients.  All
+    # pairwise Jaccard scores over the sample come from one sparse
+    # matmul (intersections are X @ X.T, unions follow from row sums),
+    # so every similar pair in the sample is considered, not just a
+    # window of neighbours in random order.
+    additional_needed = max(0, MAX_TRAINING_EXAMPLES - len(training_examples))
+    if additional_needed > 0:
+        sample_size = min(2000, len(recipe_texts))
+        sampled_indices = rng.choice(len(recipe_texts), size=sample_size, replace=False)
+        added = 0
+        vectorizer = CountVectorizer(
+            binary=True,
+            dtype=np.float32,
+            tokenizer=_INGREDIENT_TOKEN.findall,
+            token_pattern=None,
+        )
+        try:
+            bow = vectorizer.fit_transform(ingredients_lower[sampled_indices])
+        except ValueError:
+            bow = None  # empty vocabulary, e.g. all ingredient cells blank
+        if bow is not None:
+            intersections = (bow @ bow.T).toarray()
+            sizes = np.asarray(bow.sum(axis=1)).ravel()
+            unions = sizes[:, None] + sizes[None, :] - intersections
+            jaccard = intersections / np.maximum(unions, 1)
+            cand_i, cand_j = np.where(np.triu(jaccard > 0.15, k=1))
+            for i, j in zip(cand_i[:additional_needed], cand_j[:additional_needed]):
+                training_examples.append(
+                    InputExample(
+                        texts=[recipe_texts[sampled_indices[i]], recipe_texts[sampled_indices[j]]],
+                        label=0.8,
+                    )
+                )
+                added += 1
+
+        print(f"Added {added} shared-ingredient pairs")
+
+    return training_examples, recipe_texts, (cuisines_arr, ingredients_lower, titles_lower)
+
+
+def encode_sorted(model: SentenceTransformer, texts, batch_size: int = 64):
+    """
+    Encode texts sorted by length, restoring the original order.
+
+    Each batch is padded to its longest member, so mixing short queries
+    with long recipes burns most of the batch on PAD tokens. Sorting
+    first keeps batch members similar in length; the inverse permutation
+    puts the embeddings back in input order.
+    """
+    order = np.argsort([len(t) for t in texts])
+    embeddings = model.encode(
+        [texts[i] for i in order],
+        batch_size=batch_size,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return embeddings[inverse]
+
+
+def train_model(training_examples) -> SentenceTransformer:
+    """Fine-tune the base model on the prepared pairs and save it."""
+    print(f"Loading base model {BASE_MODEL} (device: {'cuda' if USE_GPU else 'cpu'})")
+    model = SentenceTransformer(BASE_MODEL)
+
+    if USE_GPU:
+        # TF32 matmuls and autotuned cudnn kernels are free speed on
+        # Ampere+ with no visible quality change at this scale.
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+        torch.backends.cudnn.benchmark = True
+
+    # BF16 matches FP16 speed on Ampere+ and needs no loss scaling; the
+    # trainer sets the autocast dtype from these flags, so they must go
+    # through the training arguments rather than torch globals.
+    use_bf16 = bool(
+        USE_GPU and os.environ.get("USE_BF16") and torch.cuda.is_bf16_supported()
+    )
+
+    # The fit() shim on current sentence-transformers drains a supplied
+    # DataLoader once to rebuild a datasets.Dataset, and the HF Trainer
+    # then builds its own dataloaders -- so loader tuning only takes
+    # effect through the training arguments.
+    train_dataset = Dataset.from_dict(
+        {
+            "sentence1": [example.texts[0] for example in training_examples],
+            "sentence2": [example.texts[1] for example in training_examples],
+            "label": [example.label for example in training_examples],
+        }
+    )
+    train_loss = losses.CosineSimilarityLoss(model)
+
+    training_args = SentenceTransformerTrainingArguments(
+        output_dir=str(MODEL_DIR.parent / "recipe-embedder-checkpoints"),
+        num_train_epochs=EPOCHS,
+        per_device_train_batch_size=BATCH_SIZE,
+        warmup_ratio=0.1,
+        fp16=USE_GPU and not use_bf16,
+        bf16=use_bf16,
+        # Opt-in: compiles the model inside the trainer, where the
+        # compiled module actually runs the forward pass.
+        torch_compile=bool(os.environ.get("TORCH_COMPILE")),
+        # Collate batches in worker processes so the training loop never
+        # waits on tokenization; pinned host memory makes the H2D copies
+        # async on GPU (opt out via NO_PIN_MEMORY if it hurts on your box).
+        dataloader_num_workers=min(4, (os.cpu_count() or 2) // 2) if USE_GPU else 2,
+        dataloader_pin_memory=USE_GPU and not os.environ.get("NO_PIN_MEMORY"),
+        save_strategy="no",
+        report_to="none",
+    )
+    trainer = SentenceTransformerTrainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        loss=train_loss,
+    )
+    trainer.train()
+
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    model.save(str(MODEL_DIR))
+    print(f"Model saved to {MODEL_DIR}")
+    return model
+
+
+def main():
+    csv_path = find_dataset()
+    df = load_recipes(csv_path)
+    training_examples, recipe_texts, _ = prepare_training_data(df)
+
+    if not training_examples:
+        print("No training examples could be generated from the dataset")
+        sys.exit(1)
+
+    model = train_model(training_examples)
+
+    # Quick sanity check on a few recipe texts.
+    test_embeddings = encode_sorted(model, recipe_texts[:5])
+    print(f"Sanity check: {len(test_embeddings)} embeddings, dim {test_embeddings.shape[1]}")
+
+    info = {
+        "base_model": BASE_MODEL,
+        "training_recipes": len(recipe_texts),
+        "training_examples": len(training_examples),
+        "epochs": EPOCHS,
+        "batch_size": BATCH_SIZE,
+        "embedding_dimension": int(test_embeddings.shape[1]),
+        "device": "cuda" if USE_GPU else "cpu",
+    }
+    with open(MODEL_DIR / "model_info.json", "w") as f:
+        json.dump(info, f, indent=2)
+
+    print("Training complete.")
+
+
+if __name__ == "__main__":
+    main()